@@ -4,8 +4,18 @@ Script de diagnóstico avanzado para el problema de conexión RPC
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+import functools
+import inspect
 import json
+import re
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 
 # RPCs que usa tu aplicación
 RPC_ENDPOINTS = [
@@ -15,98 +25,288 @@ RPC_ENDPOINTS = [
     "https://api.mainnet-beta.solana.com"  # clusterApiUrl default
 ]
 
-print("="*70)
+# Un RPC repetido en la lista se prueba una sola vez (se conserva el orden)
+_duplicate_rpcs = [rpc for i, rpc in enumerate(RPC_ENDPOINTS) if rpc in RPC_ENDPOINTS[:i]]
+RPC_ENDPOINTS = list(dict.fromkeys(RPC_ENDPOINTS))
+
+# Separador de secciones de la salida
+BANNER = "=" * 70
+
+# Máximo de llamadas simultáneas a un mismo host (evita 429 por ráfagas)
+MAX_CONCURRENCY_PER_HOST = 3
+
+# Direcciones Solana: base58 (sin 0, O, I, l) de 32 a 44 caracteres
+BASE58_RE = re.compile(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$")
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el json de la stdlib
+    orjson = None
+
+def json_dumps(obj):
+    """Serializa a JSON compacto con claves ordenadas (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+def json_loads(raw):
+    """Parsea JSON desde bytes (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Sesión compartida: reutiliza las conexiones TCP/TLS entre llamadas y RPCs.
+# Los RPCs públicos fallan de forma intermitente, así que los errores de red,
+# timeouts, 429 y 5xx se reintentan con backoff exponencial + jitter,
+# respetando Retry-After. Un 4xx o un error JSON-RPC no se reintenta.
+# Las llamadas JSON-RPC que hacemos son de lectura, así que reintentar
+# un POST es seguro.
+RPC_RETRIES = 3
+
+# Los parámetros de Retry dependen de la versión de urllib3: antes de 1.26
+# allowed_methods se llamaba method_whitelist, y backoff_max/backoff_jitter
+# solo existen desde urllib3 2 (antes se usa su tope por defecto, sin jitter)
+_retry_params = inspect.signature(Retry.__init__).parameters
+_retry_kwargs = {}
+if "allowed_methods" in _retry_params:
+    _retry_kwargs["allowed_methods"] = frozenset({"GET", "POST"})
+else:
+    _retry_kwargs["method_whitelist"] = frozenset({"GET", "POST"})
+if "backoff_jitter" in _retry_params:
+    _retry_kwargs.update(backoff_max=4, backoff_jitter=0.3)
+
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=RPC_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        **_retry_kwargs
+    )
+))
+
+def is_timeout(exc):
+    """
+    Indica si el error fue un timeout; al agotar los reintentos requests
+    entrega un timeout de lectura como ConnectionError
+    """
+    if isinstance(exc, requests.exceptions.Timeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+# Segundos que se reutiliza una resolución DNS
+DNS_CACHE_TTL = 300
+
+_dns_cache = {}
+_dns_cache_lock = threading.Lock()
+
+def resolve(host):
+    """
+    Resuelve un hostname (IPv4 e IPv6, como hace urllib3) reutilizando la
+    respuesta durante DNS_CACHE_TTL; los fallos no se cachean
+    
+    Returns:
+        Lista de direcciones en el orden devuelto por getaddrinfo
+    """
+    now = time.monotonic()
+    with _dns_cache_lock:
+        entry = _dns_cache.get(host)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)]
+    with _dns_cache_lock:
+        _dns_cache[host] = (now + DNS_CACHE_TTL, addresses)
+    return addresses
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def host_semaphore(rpc_url):
+    """Semáforo que limita las llamadas simultáneas a un mismo host"""
+    host = urlparse(rpc_url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST)
+        return _host_semaphores[host]
+
+# Las pruebas corren en paralelo: cada una imprime su bloque completo de una vez
+_print_lock = threading.Lock()
+
+print(BANNER)
 print("🔍 DIAGNÓSTICO AVANZADO DE CONEXIÓN RPC SOLANA")
-print("="*70)
+print(BANNER)
+
+for rpc in _duplicate_rpcs:
+    print(f"\nℹ️ RPC duplicado en la lista, se prueba una sola vez: {rpc}")
 
-def test_rpc_basic(rpc_url):
-    """Test básico de conectividad"""
-    print(f"\n🔄 Probando: {rpc_url}")
+@functools.lru_cache(maxsize=64)
+def encode_calls(calls):
+    """
+    Serializa las llamadas JSON-RPC una sola vez: todos los RPCs reciben el
+    mismo cuerpo, así que solo se codifica en el primer uso
+    
+    Una sola llamada viaja como objeto simple; solo varias van como batch.
+    
+    Args:
+        calls: Tupla de (método, params); la llamada i-ésima lleva id=i+1
+    """
+    payload = []
+    for call_id, (method, params) in enumerate(calls, start=1):
+        call = {"jsonrpc": "2.0", "id": call_id, "method": method}
+        if params:
+            call["params"] = list(params)
+        payload.append(call)
+    return json_dumps(payload[0] if len(payload) == 1 else payload)
+
+def rpc_batch(rpc_url, calls, timeout=10):
+    """
+    Envía una o varias llamadas JSON-RPC en un solo POST (batch JSON-RPC 2.0)
+    
+    Args:
+        rpc_url: URL del RPC endpoint
+        calls: Tupla de (método, params); la llamada i-ésima lleva id=i+1
+        timeout: Timeout en segundos
     
+    Returns:
+        Dict {id: respuesta} emparejado por el campo id de cada respuesta
+    """
+    with host_semaphore(rpc_url):
+        response = SESSION.post(
+            rpc_url,
+            data=encode_calls(calls),
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        )
+    response.raise_for_status()
+    
+    data = json_loads(response.content)
+    # Un batch rechazado entero vuelve como un único objeto de error
+    if isinstance(data, dict):
+        data = [data]
+    return {item.get("id"): item for item in data}
+
+def test_rpc_basic(rpc_url, wallet_address=None):
+    """
+    Test básico de conectividad; si se indica wallet, el getBalance viaja
+    en el mismo POST que el getHealth
+    
+    Returns:
+        Tuple de (rpc_funcional, balance_sol o None)
+    """
+    lines = [f"\n🔄 Probando: {rpc_url}"]
+    try:
+        return _test_rpc_basic(rpc_url, wallet_address, lines)
+    finally:
+        with _print_lock:
+            print("\n".join(lines))
+
+def _rpc_calls(rpc_url, calls, lines):
+    """
+    Envía las llamadas en un batch y, si el RPC no lo acepta, por separado
+    
+    Solo un fallo de la primera llamada (el getHealth) lanza excepción; si
+    falla una llamada posterior, su id queda sin respuesta.
+    """
+    if len(calls) > 1:
+        try:
+            responses = rpc_batch(rpc_url, calls)
+        except requests.exceptions.HTTPError as e:
+            # Hay proveedores que rechazan el batch con un 4xx en vez de un error JSON-RPC
+            lines.append(f"   ⚠️ El RPC rechaza el batch (HTTP {e.response.status_code}), "
+                         "llamadas por separado")
+        else:
+            # Otros responden con un único error sin id
+            if 1 in responses or None not in responses:
+                return responses
+            lines.append("   ⚠️ El RPC no acepta batch, llamadas por separado")
+    
+    responses = rpc_batch(rpc_url, calls[:1])
+    for call_id, call in enumerate(calls[1:], start=2):
+        try:
+            responses[call_id] = rpc_batch(rpc_url, (call,)).get(1, {})
+        except requests.exceptions.RequestException as e:
+            lines.append(f"   ⚠️ {call[0]} falló: {str(e)[:50]}")
+    return responses
+
+def _test_rpc_basic(rpc_url, wallet_address, lines):
     # Test 1: Conectividad básica
     try:
-        response = requests.get(rpc_url, timeout=5)
-        print(f"   ✅ Servidor responde (HTTP {response.status_code})")
-    except requests.exceptions.Timeout:
-        print(f"   ❌ Timeout al conectar")
-        return False
-    except requests.exceptions.ConnectionError as e:
-        print(f"   ❌ Error de conexión: {str(e)[:50]}")
-        return False
+        with host_semaphore(rpc_url):
+            response = SESSION.get(rpc_url, timeout=5)
+        lines.append(f"   ✅ Servidor responde (HTTP {response.status_code})")
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        if is_timeout(e):
+            lines.append(f"   ❌ Timeout al conectar ({RPC_RETRIES + 1} intentos de 5s)")
+        else:
+            lines.append(f"   ❌ Error de conexión: {str(e)[:50]}")
+        return False, None
     except Exception as e:
-        print(f"   ⚠️ Error: {str(e)[:50]}")
+        lines.append(f"   ⚠️ Error: {str(e)[:50]}")
         
     # Test 2: Llamada RPC real
+    calls = (("getHealth", ()),)
+    if wallet_address:
+        calls += (("getBalance", (wallet_address,)),)
+    
     try:
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getHealth"
-        }
-        
-        response = requests.post(
-            rpc_url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "result" in data:
-                print(f"   ✅ RPC funcional: {data['result']}")
-                return True
-            elif "error" in data:
-                print(f"   ❌ Error RPC: {data['error']}")
-                return False
-        else:
-            print(f"   ❌ HTTP Error: {response.status_code}")
-            return False
-            
+        responses = _rpc_calls(rpc_url, calls, lines)
+    except requests.exceptions.HTTPError as e:
+        lines.append(f"   ❌ HTTP Error: {e.response.status_code}")
+        return False, None
     except Exception as e:
-        print(f"   ❌ Error en llamada RPC: {str(e)}")
-        return False
-
-def test_get_balance(rpc_url, wallet_address):
-    """Test de obtención de balance"""
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getBalance",
-        "params": [wallet_address]
-    }
+        lines.append(f"   ❌ Error en llamada RPC: {str(e)}")
+        return False, None
     
-    try:
-        response = requests.post(
-            rpc_url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "result" in data and "value" in data["result"]:
-                balance = data["result"]["value"] / 1_000_000_000
-                print(f"   💰 Balance obtenido: {balance:.9f} SOL")
-                return True
-        return False
-    except:
-        return False
-
-print("\n" + "="*70)
+    balance = None
+    balance_data = responses.get(2, {})
+    if "value" in (balance_data.get("result") or {}):
+        balance = balance_data["result"]["value"] / 1_000_000_000
+    
+    health = responses.get(1) or responses.get(None, {})
+    if "result" in health:
+        lines.append(f"   ✅ RPC funcional: {health['result']}")
+        return True, balance
+    elif "error" in health:
+        lines.append(f"   ❌ Error RPC: {health['error']}")
+    return False, balance
+
+# La wallet se pide antes de los tests para que el balance viaje en el
+# mismo POST que la prueba de salud de cada RPC
+wallet_input = input("\n📍 Ingresa tu wallet address (Enter para omitir): ").strip()
+
+if wallet_input and not BASE58_RE.match(wallet_input):
+    print("   ❌ Dirección inválida (debe ser base58 de 32 a 44 caracteres), se omite el balance")
+    wallet_input = ""
+
+print("\n" + BANNER)
 print("TEST 1: CONECTIVIDAD BÁSICA")
-print("="*70)
+print(BANNER)
 
+# Todos los RPCs en paralelo: el tiempo total es el del RPC más lento.
+# La prueba DNS del TEST 3 también arranca ya, en paralelo con los RPCs.
 working_rpcs = []
-for rpc in RPC_ENDPOINTS:
-    if test_rpc_basic(rpc):
-        working_rpcs.append(rpc)
-    time.sleep(0.5)
-
-print("\n" + "="*70)
+balances = []
+with ThreadPoolExecutor(max_workers=len(RPC_ENDPOINTS) + 1) as executor:
+    dns_future = executor.submit(resolve, "api.mainnet-beta.solana.com")
+    futures = {
+        executor.submit(test_rpc_basic, rpc, wallet_input): rpc
+        for rpc in RPC_ENDPOINTS
+    }
+    # En orden de llegada: los RPCs más rápidos quedan primero en la lista
+    for future in as_completed(futures):
+        ok, balance = future.result()
+        if ok:
+            working_rpcs.append(futures[future])
+            balances.append(balance)
+
+print("\n" + BANNER)
 print("📊 RESULTADOS")
-print("="*70)
+print(BANNER)
 
 if working_rpcs:
     print(f"\n✅ {len(working_rpcs)}/{len(RPC_ENDPOINTS)} RPCs funcionando:")
@@ -121,34 +321,32 @@ else:
     print("   4. Problema temporal con los servidores de Solana")
 
 # Test con wallet si proporcionada
-print("\n" + "="*70)
+print("\n" + BANNER)
 print("TEST 2: OBTENCIÓN DE BALANCE (Opcional)")
-print("="*70)
-
-wallet_input = input("\n📍 Ingresa tu wallet address (Enter para omitir): ").strip()
+print(BANNER)
 
 if wallet_input and working_rpcs:
     print("\n🔍 Intentando obtener balance...")
-    for rpc in working_rpcs:
+    for rpc, balance in zip(working_rpcs, balances):
         print(f"\n   Usando: {rpc[:50]}...")
-        if test_get_balance(rpc, wallet_input):
-            print(f"   ✅ Balance obtenido exitosamente")
+        if balance is not None:
+            print(f"   💰 Balance obtenido: {balance:.9f} SOL")
+            print("   ✅ Balance obtenido exitosamente")
             break
         else:
-            print(f"   ❌ Falló")
+            print("   ❌ Falló")
 
 # Diagnóstico de red
-print("\n" + "="*70)
+print("\n" + BANNER)
 print("TEST 3: DIAGNÓSTICO DE RED")
-print("="*70)
+print(BANNER)
 
 print("\n🔍 Probando conectividad general...")
 
 # Test DNS
 print("\n1. Test DNS:")
 try:
-    import socket
-    socket.gethostbyname("api.mainnet-beta.solana.com")
+    dns_future.result()
     print("   ✅ DNS funcionando correctamente")
 except:
     print("   ❌ Problema con DNS")
@@ -156,7 +354,9 @@ except:
 # Test HTTP básico
 print("\n2. Test HTTP general:")
 try:
-    response = requests.get("https://www.google.com", timeout=5)
+    # Solo importa que responda: stream=True evita descargar la página entera
+    with SESSION.get("https://www.google.com", timeout=5, stream=True):
+        pass
     print("   ✅ Conexión HTTP funcionando")
 except:
     print("   ❌ Problema con conexiones HTTP")
@@ -164,15 +364,15 @@ except:
 # Información de red
 print("\n3. Configuración detectada:")
 try:
-    response = requests.get("https://api.ipify.org?format=json", timeout=5)
-    ip_info = response.json()
+    response = SESSION.get("https://api.ipify.org?format=json", timeout=5)
+    ip_info = json_loads(response.content)
     print(f"   IP pública: {ip_info.get('ip', 'Desconocida')}")
 except:
     print("   ⚠️ No se pudo obtener info de red")
 
-print("\n" + "="*70)
+print("\n" + BANNER)
 print("💡 RECOMENDACIONES")
-print("="*70)
+print(BANNER)
 
 if not working_rpcs:
     print("""
@@ -222,9 +422,9 @@ El problema puede estar en:
    - No en Devnet o Testnet
 """)
 
-print("\n" + "="*70)
+print("\n" + BANNER)
 print("🎯 SIGUIENTE PASO RECOMENDADO")
-print("="*70)
+print(BANNER)
 
 if not working_rpcs:
     print("""
@@ -243,4 +443,4 @@ Acción #2: Verifica que Phantom esté en MAINNET BETA.
 Acción #3: Usa un RPC premium (Alchemy recomendado).
 """)
 
-print("="*70)
+print(BANNER)
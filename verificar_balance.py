@@ -5,9 +5,21 @@ Prueba múltiples RPCs y muestra información detallada
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+import functools
+import inspect
+import hashlib
 import json
+import os
+import re
+import sqlite3
 import time
-from typing import Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from typing import List, Optional, Sequence, Tuple
 
 # Lista de RPCs públicos de Solana Mainnet
 RPC_ENDPOINTS = [
@@ -17,9 +29,299 @@ RPC_ENDPOINTS = [
     "https://api.mainnet.solana.com",
 ]
 
+# Máximo de llamadas simultáneas a un mismo host (evita 429 por ráfagas)
+MAX_CONCURRENCY_PER_HOST = 3
+
 LAMPORTS_PER_SOL = 1_000_000_000
 
-def check_balance(wallet_address: str, rpc_url: str, timeout: int = 10) -> Optional[Tuple[int, float]]:
+# Separador de secciones de la salida
+BANNER = "=" * 70
+
+PRICE_PER_BLOCK = 0.001  # Precio por bloque en SOL
+ESTIMATED_FEE = 0.000005  # Fee típico en SOL
+
+# Direcciones Solana: base58 (sin 0, O, I, l) de 32 a 44 caracteres
+BASE58_RE = re.compile(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$")
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el json de la stdlib
+    orjson = None
+
+def json_dumps(obj) -> bytes:
+    """Serializa a JSON compacto con claves ordenadas (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+def json_loads(raw: bytes):
+    """Parsea JSON desde bytes (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Sesión compartida: reutiliza las conexiones TCP/TLS entre llamadas y RPCs.
+# Los RPCs públicos fallan de forma intermitente, así que los errores de red,
+# timeouts, 429 y 5xx se reintentan con backoff exponencial + jitter,
+# respetando Retry-After. Un 4xx o un error JSON-RPC no se reintenta.
+# Las llamadas JSON-RPC que hacemos son de lectura, así que reintentar
+# un POST es seguro.
+RPC_RETRIES = 3
+
+# Los parámetros de Retry dependen de la versión de urllib3: antes de 1.26
+# allowed_methods se llamaba method_whitelist, y backoff_max/backoff_jitter
+# solo existen desde urllib3 2 (antes se usa su tope por defecto, sin jitter)
+_retry_params = inspect.signature(Retry.__init__).parameters
+_retry_kwargs = {}
+if "allowed_methods" in _retry_params:
+    _retry_kwargs["allowed_methods"] = frozenset({"GET", "POST"})
+else:
+    _retry_kwargs["method_whitelist"] = frozenset({"GET", "POST"})
+if "backoff_jitter" in _retry_params:
+    _retry_kwargs.update(backoff_max=4, backoff_jitter=0.3)
+
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=RPC_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        **_retry_kwargs
+    )
+))
+
+def is_timeout(exc: requests.exceptions.RequestException) -> bool:
+    """
+    Indica si el error fue un timeout; al agotar los reintentos requests
+    entrega un timeout de lectura como ConnectionError
+    """
+    if isinstance(exc, requests.exceptions.Timeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def host_semaphore(rpc_url: str) -> threading.BoundedSemaphore:
+    """Semáforo que limita las llamadas simultáneas a un mismo host"""
+    host = urlparse(rpc_url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST)
+        return _host_semaphores[host]
+
+# Las pruebas corren en paralelo: cada una imprime su bloque completo de una vez
+_print_lock = threading.Lock()
+
+# Segundos que se reutiliza una respuesta de getBalance (el balance cambia con cada slot)
+BALANCE_CACHE_TTL = 2
+
+# Una respuesta cuyo context.slot va más de esto por detrás del slot más alto
+# visto en esta ejecución no se reutiliza
+MAX_SLOT_LAG = 2
+
+# Las respuestas se conservan este tiempo como último recurso si el RPC falla
+STALE_RETENTION = 3600
+
+# Tras este número de fallos seguidos un RPC se omite durante CIRCUIT_OPEN_SECONDS
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 60
+
+# La caché y el estado de los RPCs viven en disco para que una nueva
+# ejecución reutilice las respuestas recientes y recuerde los RPCs caídos
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "solana_diag.sqlite")
+
+def _init_state_db(path: str) -> sqlite3.Connection:
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    with db:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS circuits ("
+            "rpc_url TEXT PRIMARY KEY, failures INTEGER NOT NULL, open_until REAL NOT NULL)"
+        )
+        db.execute(
+            "DELETE FROM responses WHERE expires_at <= ?",
+            (time.time() - STALE_RETENTION,)
+        )
+    return db
+
+def open_state_db(path: str = CACHE_PATH) -> sqlite3.Connection:
+    """
+    Abre la base SQLite con la caché de respuestas y el estado de los RPCs
+    
+    Sin disco escribible se usa una base en memoria que dura solo esta ejecución.
+    """
+    try:
+        return _init_state_db(path)
+    except (OSError, sqlite3.Error):
+        return _init_state_db(":memory:")
+
+class ResponseCache:
+    """Caché de respuestas RPC en SQLite con expiración por entrada, segura entre hilos"""
+    
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self._db = db
+        self._lock = lock
+    
+    @staticmethod
+    def _key(rpc_url: str, body: bytes) -> str:
+        return hashlib.sha256(rpc_url.encode() + b"\0" + body).hexdigest()
+    
+    def get(self, rpc_url: str, body: bytes, allow_stale: bool = False) -> Optional[dict]:
+        """
+        Devuelve la respuesta cacheada para (rpc_url, body) o None si no existe
+        o ya expiró; con allow_stale devuelve la última conocida aunque haya expirado
+        """
+        min_expires_at = time.time() - STALE_RETENTION if allow_stale else time.time()
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value FROM responses WHERE key = ? AND expires_at > ?",
+                    (self._key(rpc_url, body), min_expires_at)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return json_loads(row[0]) if row else None
+    
+    def set(self, rpc_url: str, body: bytes, value: dict, ttl: float):
+        """Guarda una respuesta durante ttl segundos"""
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                    (self._key(rpc_url, body), time.time() + ttl, json_dumps(value))
+                )
+        except sqlite3.Error:
+            pass  # la caché es solo una optimización
+
+class CircuitBreaker:
+    """
+    Circuit breaker por RPC, persistido en SQLite entre ejecuciones
+    
+    Tras CIRCUIT_FAILURE_THRESHOLD fallos seguidos el RPC queda abierto
+    (se omite) durante CIRCUIT_OPEN_SECONDS; pasado ese tiempo se vuelve
+    a probar y un solo fallo más lo reabre. Un éxito lo reinicia.
+    """
+    
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self._db = db
+        self._lock = lock
+    
+    def open_for(self, rpc_url: str) -> float:
+        """Segundos que le quedan abierto al RPC, 0 si se puede consultar"""
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT open_until FROM circuits WHERE rpc_url = ?", (rpc_url,)
+                ).fetchone()
+        except sqlite3.Error:
+            return 0
+        return max(0, row[0] - time.time()) if row else 0
+    
+    def record_success(self, rpc_url: str):
+        """Reinicia el contador de fallos del RPC"""
+        try:
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM circuits WHERE rpc_url = ?", (rpc_url,))
+        except sqlite3.Error:
+            pass
+    
+    def record_failure(self, rpc_url: str):
+        """Suma un fallo y abre el circuito si se alcanza el umbral"""
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT INTO circuits (rpc_url, failures, open_until) VALUES (?, 1, 0) "
+                    "ON CONFLICT(rpc_url) DO UPDATE SET failures = failures + 1",
+                    (rpc_url,)
+                )
+                self._db.execute(
+                    "UPDATE circuits SET open_until = ? WHERE rpc_url = ? AND failures >= ?",
+                    (time.time() + CIRCUIT_OPEN_SECONDS, rpc_url, CIRCUIT_FAILURE_THRESHOLD)
+                )
+        except sqlite3.Error:
+            pass
+
+@functools.lru_cache(maxsize=None)
+def get_state() -> Tuple[ResponseCache, CircuitBreaker]:
+    """
+    Caché de respuestas y circuit breaker, sobre una base que se abre al primer uso
+    
+    Importar el módulo no crea nada en disco; main() la abre antes de lanzar
+    las consultas en paralelo.
+    """
+    db = open_state_db()
+    lock = threading.Lock()
+    return ResponseCache(db, lock), CircuitBreaker(db, lock)
+
+_head_slot = 0
+_head_slot_lock = threading.Lock()
+
+def decide_ttl(data: dict) -> float:
+    """
+    TTL de una respuesta de getBalance, decidido después de recibirla
+    
+    El slot más alto visto entre los RPCs de esta ejecución hace de slot
+    actual: si la respuesta va rezagada, se guarda sin reutilizarla.
+    """
+    global _head_slot
+    slot = data["result"].get("context", {}).get("slot")
+    if slot is None:
+        return BALANCE_CACHE_TTL
+    with _head_slot_lock:
+        _head_slot = max(_head_slot, slot)
+        lag = _head_slot - slot
+    return 0 if lag > MAX_SLOT_LAG else BALANCE_CACHE_TTL
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+@functools.lru_cache(maxsize=64)
+def get_balance_body(wallet_address: str) -> bytes:
+    """
+    Cuerpo JSON-RPC del getBalance, serializado una sola vez por wallet
+    
+    Es JSON canónico (compacto, claves ordenadas), así que también sirve
+    como clave de caché.
+    """
+    return json_dumps({
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "getBalance",
+        "params": [wallet_address]
+    })
+
+def _stale_balance(rpc_url: str, body: bytes, lines: list) -> Tuple[str, Optional[Tuple[int, float]]]:
+    """Último balance conocido de un RPC, para cuando la consulta falla"""
+    response_cache, _ = get_state()
+    data = response_cache.get(rpc_url, body, allow_stale=True)
+    if data is None or "value" not in data["result"]:
+        return "error", None
+    
+    balance_lamports = data["result"]["value"]
+    balance_sol = balance_lamports / LAMPORTS_PER_SOL
+    slot = data["result"].get("context", {}).get("slot", "?")
+    
+    lines.append(f"⚠️ Usando el último balance conocido (slot {slot}, puede estar desactualizado)")
+    lines.append(f"   Balance: {balance_sol:.9f} SOL")
+    lines.append(f"   Lamports: {balance_lamports:,}")
+    
+    return "stale", (balance_lamports, balance_sol)
+
+def check_balance(
+    wallet_address: str,
+    rpc_url: str,
+    timeout: int = 10
+) -> Tuple[str, Optional[Tuple[int, float]]]:
     """
     Verifica el balance de una wallet en Solana
     
@@ -29,87 +331,136 @@ def check_balance(wallet_address: str, rpc_url: str, timeout: int = 10) -> Optio
         timeout: Timeout en segundos
     
     Returns:
-        Tuple de (balance_lamports, balance_sol) o None si falla
+        Tuple de (estado, balance): estado es "ok" si el RPC respondió,
+        "cached" si el balance salió de la caché sin consultarlo, "stale"
+        si falló y balance es el último conocido, "skipped" si no se
+        consultó por tener el circuito abierto, o "error"; balance es
+        (balance_lamports, balance_sol) o None
     """
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getBalance",
-        "params": [wallet_address]
-    }
-    
-    headers = {
-        "Content-Type": "application/json"
-    }
+    body = get_balance_body(wallet_address)
+    response_cache, circuit_breaker = get_state()
+    lines = [f"\n🔄 Probando RPC: {rpc_url}"]
     
     try:
-        print(f"\n🔄 Probando RPC: {rpc_url}")
         start_time = time.time()
+        data = response_cache.get(rpc_url, body)
+        cached = data is not None
         
-        response = requests.post(
-            rpc_url,
-            json=payload,
-            headers=headers,
-            timeout=timeout
-        )
+        if data is None:
+            open_for = circuit_breaker.open_for(rpc_url)
+            if open_for:
+                lines.append(f"⏭️ RPC omitido: falló {CIRCUIT_FAILURE_THRESHOLD} veces seguidas, "
+                             f"se reintentará en {open_for:.0f}s")
+                _, stale = _stale_balance(rpc_url, body, lines)
+                return "skipped", stale
+            
+            with host_semaphore(rpc_url):
+                response = SESSION.post(
+                    rpc_url,
+                    data=body,
+                    headers=JSON_HEADERS,
+                    timeout=timeout
+                )
+            
+            if response.status_code != 200:
+                lines.append(f"❌ Error HTTP {response.status_code}")
+                circuit_breaker.record_failure(rpc_url)
+                return _stale_balance(rpc_url, body, lines)
+            
+            data = json_loads(response.content)
+            circuit_breaker.record_success(rpc_url)
+            # Solo se cachean respuestas válidas, nunca errores
+            if isinstance(data.get("result"), dict):
+                response_cache.set(rpc_url, body, data, decide_ttl(data))
         
         elapsed_time = time.time() - start_time
         
-        if response.status_code == 200:
-            data = response.json()
+        if "result" in data and "value" in data["result"]:
+            balance_lamports = data["result"]["value"]
+            balance_sol = balance_lamports / LAMPORTS_PER_SOL
             
-            if "result" in data and "value" in data["result"]:
-                balance_lamports = data["result"]["value"]
-                balance_sol = balance_lamports / LAMPORTS_PER_SOL
-                
-                print(f"✅ RPC funcionando ({elapsed_time:.2f}s)")
-                print(f"   Balance: {balance_sol:.9f} SOL")
-                print(f"   Lamports: {balance_lamports:,}")
-                
-                return balance_lamports, balance_sol
+            if cached:
+                lines.append("💾 Balance desde caché (RPC no consultado)")
             else:
-                print(f"❌ Respuesta sin 'result' válido")
-                print(f"   Respuesta: {json.dumps(data, indent=2)}")
-                return None
+                lines.append(f"✅ RPC funcionando ({elapsed_time:.2f}s)")
+            lines.append(f"   Balance: {balance_sol:.9f} SOL")
+            lines.append(f"   Lamports: {balance_lamports:,}")
+            
+            return ("cached" if cached else "ok"), (balance_lamports, balance_sol)
         else:
-            print(f"❌ Error HTTP {response.status_code}")
-            return None
+            lines.append("❌ Respuesta sin 'result' válido")
+            lines.append(f"   Respuesta: {json.dumps(data, indent=2)}")
+            return "error", None
             
-    except requests.exceptions.Timeout:
-        print(f"⏱️ Timeout después de {timeout}s")
-        return None
     except requests.exceptions.RequestException as e:
-        print(f"❌ Error de conexión: {str(e)}")
-        return None
+        if is_timeout(e):
+            lines.append(f"⏱️ Timeout: sin respuesta en {RPC_RETRIES + 1} intentos de {timeout}s")
+        else:
+            lines.append(f"❌ Error de conexión: {str(e)}")
+        circuit_breaker.record_failure(rpc_url)
+        return _stale_balance(rpc_url, body, lines)
     except Exception as e:
-        print(f"❌ Error inesperado: {str(e)}")
-        return None
+        lines.append(f"❌ Error inesperado: {str(e)}")
+        return "error", None
+    finally:
+        with _print_lock:
+            print("\n".join(lines))
 
 def check_wallet_in_explorer(wallet_address: str):
     """Genera enlaces a exploradores de blockchain"""
-    print(f"\n🔗 Enlaces para verificar tu wallet:")
+    print("\n🔗 Enlaces para verificar tu wallet:")
     print(f"   Solana Explorer: https://explorer.solana.com/address/{wallet_address}")
     print(f"   Solscan: https://solscan.io/account/{wallet_address}")
     print(f"   Solana Beach: https://solanabeach.io/address/{wallet_address}")
 
-def estimate_fees(num_blocks: int, price_per_block: float = 0.001) -> dict:
+def estimate_fees_vec(
+    blocks: Sequence[int],
+    price_per_block: float = PRICE_PER_BLOCK,
+    fee: float = ESTIMATED_FEE
+) -> List[Tuple[float, float, float]]:
+    """
+    Estima el costo de varias cantidades de bloques en una sola pasada
+    
+    Returns:
+        Lista de (subtotal, fee, total) en SOL, una fila por cantidad de bloques
+    """
+    return [(n * price_per_block, fee, n * price_per_block + fee) for n in blocks]
+
+def estimate_fees(num_blocks: int, price_per_block: float = PRICE_PER_BLOCK) -> dict:
     """Estima el costo total incluyendo fees"""
-    total_price = num_blocks * price_per_block
-    estimated_fee = 0.000005  # Fee típico en SOL
-    total_needed = total_price + estimated_fee
+    (subtotal, estimated_fee, total_needed), = estimate_fees_vec([num_blocks], price_per_block)
     
     return {
         "blocks": num_blocks,
         "price_per_block": price_per_block,
-        "subtotal": total_price,
+        "subtotal": subtotal,
         "estimated_fee": estimated_fee,
         "total": total_needed
     }
 
+def print_stale_balances(stale_balances: List[Tuple[str, Tuple[int, float]]]):
+    """Muestra los balances desactualizados, que no cuentan para el promedio"""
+    if not stale_balances:
+        return
+    print(f"\n⚠️ RPCs caídos con balance desactualizado: {len(stale_balances)} (fuera del promedio)")
+    for rpc_url, (_, balance_sol) in stale_balances:
+        print(f"   {rpc_url}: {balance_sol:.9f} SOL")
+
+def print_skipped_rpcs(skipped_rpcs: List[Tuple[str, Optional[Tuple[int, float]]]]):
+    """Muestra los RPCs omitidos por el circuit breaker, con su último balance si lo hay"""
+    if not skipped_rpcs:
+        return
+    print(f"\n⏭️ RPCs omitidos por fallos recientes: {len(skipped_rpcs)} (fuera del promedio)")
+    for rpc_url, balance in skipped_rpcs:
+        if balance:
+            print(f"   {rpc_url}: {balance[1]:.9f} SOL (último conocido)")
+        else:
+            print(f"   {rpc_url}: sin balance conocido")
+
 def main():
-    print("=" * 70)
+    print(BANNER)
     print("🔍 DIAGNÓSTICO DE BALANCE DE WALLET SOLANA")
-    print("=" * 70)
+    print(BANNER)
     
     # Solicitar dirección de wallet
     wallet_address = input("\n📍 Ingresa tu dirección de wallet (pública): ").strip()
@@ -118,33 +469,53 @@ def main():
         print("❌ Dirección de wallet vacía")
         return
     
-    # Validación básica de formato (Solana addresses son base58, ~32-44 caracteres)
-    if len(wallet_address) < 32 or len(wallet_address) > 44:
-        print("⚠️ Advertencia: La dirección parece tener longitud inválida")
-        continuar = input("¿Continuar de todos modos? (s/n): ")
-        if continuar.lower() != 's':
-            return
+    # Validación de formato antes de tocar la red (base58, 32-44 caracteres)
+    if not BASE58_RE.match(wallet_address):
+        print("❌ Dirección inválida: debe ser base58 de 32 a 44 caracteres")
+        return
     
     print(f"\n💼 Wallet: {wallet_address}")
     
+    # Abrir la caché y el estado de los RPCs antes de lanzar los hilos
+    get_state()
+    
     # Verificar balance en múltiples RPCs
     balances = []
     working_rpcs = []
+    cached_rpcs = []
+    stale_balances = []
+    skipped_rpcs = []
     
-    for rpc_url in RPC_ENDPOINTS:
-        result = check_balance(wallet_address, rpc_url)
-        if result:
-            balances.append(result)
-            working_rpcs.append(rpc_url)
-            time.sleep(0.5)  # Pequeña pausa entre requests
+    # Todas las consultas en paralelo: el tiempo total es el del RPC más lento
+    with ThreadPoolExecutor(max_workers=len(RPC_ENDPOINTS)) as executor:
+        futures = {
+            executor.submit(check_balance, wallet_address, rpc_url): rpc_url
+            for rpc_url in RPC_ENDPOINTS
+        }
+        # Se procesan en orden de llegada, sin esperar al RPC más lento
+        for future in as_completed(futures):
+            status, balance = future.result()
+            if status == "ok":
+                balances.append(balance)
+                working_rpcs.append(futures[future])
+            elif status == "cached":
+                # Balance reciente y válido, pero sin comprobar el RPC
+                balances.append(balance)
+                cached_rpcs.append(futures[future])
+            elif status == "stale":
+                stale_balances.append((futures[future], balance))
+            elif status == "skipped":
+                skipped_rpcs.append((futures[future], balance))
     
     # Resumen de resultados
-    print("\n" + "=" * 70)
+    print("\n" + BANNER)
     print("📊 RESUMEN DE RESULTADOS")
-    print("=" * 70)
+    print(BANNER)
     
     if not balances:
         print("\n❌ No se pudo obtener el balance desde ningún RPC")
+        print_stale_balances(stale_balances)
+        print_skipped_rpcs(skipped_rpcs)
         print("\nPosibles causas:")
         print("   1. Dirección de wallet incorrecta")
         print("   2. Problemas de conexión a internet")
@@ -153,23 +524,33 @@ def main():
         check_wallet_in_explorer(wallet_address)
         return
     
-    # Calcular estadísticas
-    balance_values = [b[1] for b in balances]
-    avg_balance = sum(balance_values) / len(balance_values)
-    min_balance = min(balance_values)
-    max_balance = max(balance_values)
+    # Calcular estadísticas en una sola pasada
+    total_balance = 0.0
+    min_balance = max_balance = balances[0][1]
+    for _, balance_sol in balances:
+        total_balance += balance_sol
+        if balance_sol < min_balance:
+            min_balance = balance_sol
+        elif balance_sol > max_balance:
+            max_balance = balance_sol
+    avg_balance = total_balance / len(balances)
     
     print(f"\n✅ RPCs funcionando: {len(working_rpcs)}/{len(RPC_ENDPOINTS)}")
+    if cached_rpcs:
+        print(f"💾 RPCs servidos desde caché: {len(cached_rpcs)}")
+    print_stale_balances(stale_balances)
+    print_skipped_rpcs(skipped_rpcs)
     print(f"\n💰 Balance promedio: {avg_balance:.9f} SOL")
     
-    if len(set(balance_values)) > 1:
+    # Hay balances distintos si y solo si el mínimo difiere del máximo
+    if min_balance != max_balance:
         print(f"   Rango: {min_balance:.9f} - {max_balance:.9f} SOL")
         print("   ⚠️ Los RPCs reportan balances ligeramente diferentes (normal)")
     
     # Estimación de compras
-    print("\n" + "=" * 70)
+    print("\n" + BANNER)
     print("💳 ESTIMACIÓN DE COMPRAS POSIBLES")
-    print("=" * 70)
+    print(BANNER)
     
     if avg_balance == 0:
         print("\n⚠️ Balance actual: 0 SOL")
@@ -183,25 +564,24 @@ def main():
         print("\nEjemplos de compras posibles:")
         
         examples = [1, 10, 25, 50, 100]
-        for num_blocks in examples:
-            estimate = estimate_fees(num_blocks)
-            
-            if estimate["total"] <= avg_balance:
+        estimates = estimate_fees_vec(examples)
+        for num_blocks, (subtotal, fee, total) in zip(examples, estimates):
+            if total <= avg_balance:
                 status = "✅"
             else:
                 status = "❌"
             
             print(f"\n   {status} {num_blocks} bloques:")
-            print(f"      Precio: {estimate['subtotal']:.6f} SOL")
-            print(f"      Fee: {estimate['estimated_fee']:.6f} SOL")
-            print(f"      Total: {estimate['total']:.6f} SOL")
+            print(f"      Precio: {subtotal:.6f} SOL")
+            print(f"      Fee: {fee:.6f} SOL")
+            print(f"      Total: {total:.6f} SOL")
     
     # Enlaces a exploradores
     check_wallet_in_explorer(wallet_address)
     
-    print("\n" + "=" * 70)
+    print("\n" + BANNER)
     print("✅ Diagnóstico completado")
-    print("=" * 70)
+    print(BANNER)
 
 if __name__ == "__main__":
     try: